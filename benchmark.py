@@ -0,0 +1,366 @@
+# Offline performance regression benchmark for the sample API wrapper code
+
+# Traffic of real-world size is generated by a synthetic Webex server, recorded
+# to a cassette (see cassette.py), then replayed through the sampleFlow.py request
+# functions - timing envelope building, transport and response parsing without
+# calling Webex.
+
+# Usage:
+
+#   python benchmark.py                   Run, and compare against the saved baseline
+#   python benchmark.py --save-baseline   Run, and save the results as the new baseline
+#   python benchmark.py --export-scaling  Time a multi-host ExportMeetings() with response
+#                                         decoding in 0 (threads only), 1, 2, 4... worker processes
+
+# The baseline is kept in benchmark_baseline.json, next to this script (or the
+# file given by --baseline).  A scenario more than --tolerance (default 20%) slower
+# than its baseline, or missing from the baseline, fails the run.
+
+# The committed benchmark_baseline.json is a reference baseline from a single-core
+# Linux VM with Python 3.11.  Timings are machine-specific, so in CI compare
+# against a baseline produced on the same runner, e.g.:
+
+#   git checkout <base branch> && python benchmark.py --save-baseline --baseline /tmp/baseline.json
+#   git checkout <PR branch>   && python benchmark.py --baseline /tmp/baseline.json
+
+# Update the committed reference (--save-baseline) when a slowdown is intended.
+
+# Copyright (c) 2019 Cisco and/or its affiliates.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import argparse
+import datetime
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+
+import requests
+
+import cassette
+import decodePool
+import sampleFlow
+
+BASELINE_FILE = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'benchmark_baseline.json' )
+
+# Size of the generated list responses
+MEETING_COUNT = 500
+MEETING_TYPE_COUNT = 40
+
+START_DATE = '01/04/2021 09:00:00'
+
+RESPONSE_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<serv:message xmlns:serv="http://www.webex.com/schemas/2002/06/service"
+    xmlns:com="http://www.webex.com/schemas/2002/06/common"
+    xmlns:meet="http://www.webex.com/schemas/2002/06/service/meeting"
+    xmlns:use="http://www.webex.com/schemas/2002/06/service/user">
+    <serv:header>
+        <serv:response>
+            <serv:result>SUCCESS</serv:result>
+            <serv:gsbStatus>PRIMARY</serv:gsbStatus>
+        </serv:response>
+    </serv:header>
+    <serv:body>
+        <serv:bodyContent>{body}</serv:bodyContent>
+    </serv:body>
+</serv:message>'''
+
+def summaryMeeting( number, hostWebExId ):
+
+    startDate = datetime.datetime( 2021, 1, 4, 9 ) + datetime.timedelta( minutes = 30 * number )
+
+    return f'''
+            <meet:meeting>
+                <meet:meetingKey>{ 100000000 + number }</meet:meetingKey>
+                <meet:confName>Meeting { number }</meet:confName>
+                <meet:meetingType>105</meet:meetingType>
+                <meet:hostWebExID>{ hostWebExId }</meet:hostWebExID>
+                <meet:otherHostWebExID>{ hostWebExId }</meet:otherHostWebExID>
+                <meet:timeZoneID>4</meet:timeZoneID>
+                <meet:timeZone>GMT-08:00, Pacific (San Jose)</meet:timeZone>
+                <meet:status>NOT_INPROGRESS</meet:status>
+                <meet:startDate>{ startDate.strftime( '%m/%d/%Y %H:%M:%S' ) }</meet:startDate>
+                <meet:duration>30</meet:duration>
+                <meet:listStatus>PUBLIC</meet:listStatus>
+                <meet:hasBeenRecurred>false</meet:hasBeenRecurred>
+            </meet:meeting>'''
+
+# Stands in for the Webex XML API endpoint, returning a response of typical
+# shape (and list responses of large size) for each operation
+class SyntheticWebex:
+
+    def __init__( self, meetingsPerHost = MEETING_COUNT ):
+
+        self.meetingsPerHost = meetingsPerHost
+
+    def post( self, url, data = None, **kwargs ):
+
+        envelope = cassette.toBytes( data )
+        operation = cassette.operationName( envelope )
+
+        hostMatch = re.search( rb'<hostWebExID>([^<]*)</hostWebExID>', envelope )
+        hostWebExId = hostMatch.group( 1 ).decode() if hostMatch else 'host@example.com'
+
+        if operation == 'user.AuthenticateUser':
+            body = '<use:sessionTicket>AAABsynthetic</use:sessionTicket><use:createTime>1609459200000</use:createTime>'
+
+        elif operation == 'user.GetUser':
+            body = '<use:meetingTypes>' + ''.join( f'<use:meetingType>{ 100 + number }</use:meetingType>'
+                for number in range( MEETING_TYPE_COUNT ) ) + '</use:meetingTypes>'
+
+        elif operation == 'meeting.LstsummaryMeeting':
+            maximumNum = int( re.search( rb'<maximumNum>(\d+)</maximumNum>', envelope ).group( 1 ) )
+            startFromMatch = re.search( rb'<startFrom>(\d+)</startFrom>', envelope )
+            startFrom = int( startFromMatch.group( 1 ) ) if startFromMatch else 1
+
+            numbers = range( startFrom - 1, min( startFrom - 1 + maximumNum, self.meetingsPerHost ) )
+
+            body = ''.join( summaryMeeting( number, hostWebExId ) for number in numbers )
+            body += f'''
+            <meet:matchingRecords>
+                <serv:total>{ self.meetingsPerHost }</serv:total>
+                <serv:returned>{ len( numbers ) }</serv:returned>
+                <serv:startFrom>{ startFrom }</serv:startFrom>
+            </meet:matchingRecords>'''
+
+        elif operation == 'site.GetSite':
+            body = '''
+            <ns1:siteInstance xmlns:ns1="http://www.webex.com/schemas/2002/06/service/site">
+                <ns1:metaData><ns1:siteName>example</ns1:siteName><ns1:brandName>example</ns1:brandName></ns1:metaData>
+            </ns1:siteInstance>'''
+
+        elif operation == 'meetingtype.LstMeetingType':
+            body = ''.join( f'''
+            <mtgtype:meetingType xmlns:mtgtype="http://www.webex.com/schemas/2002/06/service/meetingtype">
+                <mtgtype:productCodePrefix>PRO</mtgtype:productCodePrefix>
+                <mtgtype:active>ACTIVE</mtgtype:active>
+                <mtgtype:name>Type { number }</mtgtype:name>
+                <mtgtype:displayName>Meeting Type { number }</mtgtype:displayName>
+                <mtgtype:meetingTypeID>{ 100 + number }</mtgtype:meetingTypeID>
+            </mtgtype:meetingType>''' for number in range( MEETING_TYPE_COUNT ) )
+
+        elif operation == 'meeting.GetMeeting':
+            body = f'''
+            <meet:accessControl><meet:meetingPassword>C!sco123</meet:meetingPassword></meet:accessControl>
+            <meet:metaData><meet:confName>Meeting 0</meet:confName><meet:meetingType>105</meet:meetingType></meet:metaData>
+            <meet:schedule><meet:startDate>{ START_DATE }</meet:startDate><meet:duration>30</meet:duration></meet:schedule>
+            <meet:meetingkey>100000000</meet:meetingkey>
+            <meet:meetingLink>https://example.webex.com/example/j.php?MTID=m0</meet:meetingLink>'''
+
+        else:
+            body = ''
+
+        response = requests.models.Response()
+        response.status_code = 200
+        response._content = RESPONSE_TEMPLATE.format( body = body ).encode( 'utf-8' )
+
+        return response
+
+def context():
+
+    return { 'siteName': 'example', 'webExId': 'host@example.com', 'sessionTicket': 'AAABsynthetic' }
+
+# Each scenario makes one request through sampleFlow and parses the response
+# the way the sample does
+
+def authenticateUser():
+
+    sampleFlow.AuthenticateUser( 'example', 'host@example.com', None, 'synthetic-token' )
+
+def getUser():
+
+    response = sampleFlow.GetUser( context() )
+
+    [ meetingType.text for meetingType in response.find( '{*}body/{*}bodyContent/{*}meetingTypes' ) ]
+
+def lstsummaryMeeting():
+
+    response = sampleFlow.LstsummaryMeeting( context(),
+        maximumNum = MEETING_COUNT,
+        orderBy = 'STARTTIME',
+        orderAD = 'ASC',
+        hostWebExId = 'host@example.com',
+        startDateStart = START_DATE )
+
+    for meeting in response.iter( '{*}meeting' ):
+        ( meeting.find( '{*}startDate' ).text,
+          meeting.find( '{*}confName' ).text,
+          meeting.find( '{*}meetingKey' ).text )
+
+def getMeeting():
+
+    response = sampleFlow.GetMeeting( context(), '100000000' )
+
+    response.find( '{*}body/{*}bodyContent/{*}metaData/{*}confName' ).text
+    response.find( '{*}body/{*}bodyContent/{*}meetingLink' ).text
+
+def fetchSiteCatalogue():
+
+    catalogue = sampleFlow.FetchSiteCatalogue( context(), 'etag', sampleFlow.userMeetingTypeIds( context() ) )
+
+    catalogue.meetingTypeNamed( 'Meeting Type 1' )
+
+SCENARIOS = {
+    'AuthenticateUser': authenticateUser,
+    'GetUser': getUser,
+    'FetchSiteCatalogue': fetchSiteCatalogue,
+    'LstsummaryMeeting': lstsummaryMeeting,
+    'GetMeeting': getMeeting
+}
+
+# Send every scenario's requests to the synthetic server, recording the traffic
+def recordCassette( fileName ):
+
+    recorder = cassette.RecordingTransport( SyntheticWebex(), fileName )
+    sampleFlow.transport = recorder
+
+    for scenario in SCENARIOS.values():
+        scenario()
+
+    recorder.writer.save()
+
+# Returns { scenario: median seconds per call }
+def runScenarios( number, repeat ):
+
+    results = { }
+
+    for name, scenario in SCENARIOS.items():
+
+        timings = timeit.repeat( scenario, number = number, repeat = repeat )
+        results[ name ] = statistics.median( timings ) / number
+
+    return results
+
+# Replay a multi-host export with an increasing number of decode worker processes,
+# printing meetings decoded per second for each
+def exportScaling( hosts, meetingsPerHost, pageSize ):
+
+    hostWebExIds = [ f'host{ number }@example.com' for number in range( hosts ) ]
+
+    workerCounts = [ 0 ]
+    while workerCounts[ -1 ] < os.cpu_count():
+        workerCounts.append( min( max( 1, workerCounts[ -1 ] * 2 ), os.cpu_count() ) )
+
+    with tempfile.TemporaryDirectory() as tempDir:
+
+        fileName = os.path.join( tempDir, 'export.cassette' )
+
+        recorder = cassette.RecordingTransport( SyntheticWebex( meetingsPerHost ), fileName )
+        sampleFlow.transport = recorder
+        sampleFlow.ExportMeetings( context(), hostWebExIds, START_DATE, pageSize )
+        recorder.writer.save()
+
+        sampleFlow.transport = cassette.ReplayTransport( fileName )
+
+        print( f'Export of { hosts } hosts x { meetingsPerHost } meetings, { pageSize } per page\n' )
+        print( '{0:10}{1:>12}{2:>18}{3:>10}'.format( 'Workers', 'Time (s)', 'Meetings/s', 'Speedup' ) )
+        print( '{0:10}{1:>12}{2:>18}{3:>10}'.format( '-' * 7, '-' * 8, '-' * 10, '-' * 7 ) )
+
+        for workers in workerCounts:
+
+            with decodePool.DecodePool( workers ) as pool:
+
+                # Warm up, so worker start-up isn't counted
+                sampleFlow.ExportMeetings( context(), hostWebExIds[ : max( workers, 1 ) ], START_DATE, pageSize, pool )
+
+                start = time.perf_counter()
+                meetings = sampleFlow.ExportMeetings( context(), hostWebExIds, START_DATE, pageSize, pool,
+                    threads = max( 8, workers * 2 ) )
+                seconds = time.perf_counter() - start
+
+            count = sum( len( hostMeetings ) for hostMeetings in meetings.values() )
+
+            if workers == 0:
+                baseline = seconds
+
+            print( '{0:<10}{1:12.2f}{2:18,.0f}{3:9.2f}x'.format( workers, seconds, count / seconds, baseline / seconds ) )
+
+        sampleFlow.transport.cassette.close()
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser( description = 'Replay recorded traffic through sampleFlow.py and time it' )
+    parser.add_argument( '--save-baseline', action = 'store_true', help = 'save results as the new baseline' )
+    parser.add_argument( '--baseline', default = BASELINE_FILE, help = 'baseline file (default benchmark_baseline.json)' )
+    parser.add_argument( '--tolerance', type = float, default = 0.2, help = 'allowed slowdown vs. baseline (default 0.2)' )
+    parser.add_argument( '--number', type = int, default = 20, help = 'calls per timing run' )
+    parser.add_argument( '--repeat', type = int, default = 5, help = 'timing runs per scenario' )
+    parser.add_argument( '--export-scaling', action = 'store_true', help = 'benchmark multi-host export vs. decode workers' )
+    parser.add_argument( '--hosts', type = int, default = 32, help = 'hosts in the export (default 32)' )
+    parser.add_argument( '--meetings-per-host', type = int, default = 5000, help = 'meetings per host (default 5000)' )
+    parser.add_argument( '--page-size', type = int, default = 500, help = 'meetings per LstsummaryMeeting page' )
+    args = parser.parse_args()
+
+    if args.export_scaling:
+        exportScaling( args.hosts, args.meetings_per_host, args.page_size )
+        sys.exit( 0 )
+
+    with tempfile.TemporaryDirectory() as tempDir:
+
+        fileName = os.path.join( tempDir, 'benchmark.cassette' )
+
+        recordCassette( fileName )
+
+        sampleFlow.transport = cassette.ReplayTransport( fileName )
+
+        results = runScenarios( args.number, args.repeat )
+
+        sampleFlow.transport.cassette.close()
+
+    try:
+        with open( args.baseline, 'r' ) as baselineFile:
+            baseline = json.load( baselineFile )
+    except FileNotFoundError:
+        baseline = { }
+
+    print( '{0:22}{1:>14}{2:>14}{3:>10}'.format( 'Scenario', 'Time (ms)', 'Baseline', 'Change' ) )
+    print( '{0:22}{1:>14}{2:>14}{3:>10}'.format( '-' * 8, '-' * 9, '-' * 8, '-' * 6 ) )
+
+    regressions = [ ]
+    missing = [ ]
+
+    for name, seconds in results.items():
+
+        if name in baseline:
+            change = seconds / baseline[ name ] - 1
+            print( '{0:22}{1:14.3f}{2:14.3f}{3:+10.1%}'.format( name, seconds * 1000, baseline[ name ] * 1000, change ) )
+
+            if change > args.tolerance:
+                regressions.append( name )
+        else:
+            print( '{0:22}{1:14.3f}{2:>14}'.format( name, seconds * 1000, '-' ) )
+            missing.append( name )
+
+    if args.save_baseline:
+        with open( args.baseline, 'w' ) as baselineFile:
+            json.dump( results, baselineFile, indent = 4, sort_keys = True )
+
+        print( f'\nBaseline saved to { args.baseline }' )
+        sys.exit( 0 )
+
+    if missing:
+        print( '\nNo baseline for:', ', '.join( missing ), '(save one with --save-baseline)' )
+
+    if regressions:
+        print( '\nSlower than baseline:', ', '.join( regressions ) )
+
+    if missing or regressions:
+        sys.exit( 1 )
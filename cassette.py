@@ -0,0 +1,296 @@
+# Record/replay of Webex Meetings XML API traffic, for offline testing and benchmarks
+
+# In record mode, each request envelope and its response are captured, with
+# credentials/tickets redacted, and merged into the cassette file on exit.
+# In replay mode, responses are served from the cassette with no network access;
+# a request with no matching recording raises CassetteMissError.
+
+# Requests are matched on their whole envelope, except that timestamps (e.g.
+# CreateMeeting's startDate, which the samples base on the current time) are
+# replaced by a placeholder, so recordings replay across runs.
+
+# Configure via .env:
+
+#   CASSETTE_MODE : 'record' or 'replay' (leave empty to call Webex as normal)
+#   CASSETTE_FILE : cassette file name (default: webex.cassette)
+
+# Cassette file layout (all integers little-endian):
+
+#   header  : magic (8 bytes), record count (uint32), index offset (uint64)
+#   records : status (uint16), envelope length (uint32), response length (uint32),
+#             redacted envelope bytes, redacted response bytes
+#   index   : entry count (uint32), then entries of SHA-1 key (20 bytes) and record
+#             offset (uint64), sorted by key
+
+# The index is binary searched directly in the memory-mapped file, so opening
+# a cassette doesn't require reading or parsing the whole thing.
+
+# Copyright (c) 2019 Cisco and/or its affiliates.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import atexit
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+
+import requests
+
+MAGIC = b'WXCASS02'
+HEADER = struct.Struct( '<8sIQ' )
+RECORD = struct.Struct( '<HII' )
+COUNT = struct.Struct( '<I' )
+ENTRY = struct.Struct( '<20sQ' )
+
+DEFAULT_CASSETTE_FILE = 'webex.cassette'
+
+# Elements whose content is replaced before anything is written to the cassette
+REDACTED_ELEMENTS = [ 'password', 'accessToken', 'webExAccessToken', 'sessionTicket',
+    'meetingPassword', 'ticket' ]
+
+redactPattern = re.compile(
+    rb'<((?:\w+:)?(?:' + '|'.join( REDACTED_ELEMENTS ).encode() + rb'))>[^<]*</\1>' )
+
+# Elements holding timestamps, ignored when matching requests
+TIMESTAMP_ELEMENTS = [ 'startDate', 'startDateStart', 'startDateEnd', 'endDateStart', 'endDateEnd' ]
+
+timestampPattern = re.compile(
+    rb'<((?:\w+:)?(?:' + '|'.join( TIMESTAMP_ELEMENTS ).encode() + rb'))>[^<]*</\1>' )
+
+operationPattern = re.compile( rb'xsi:type="java:com\.webex\.service\.binding\.([\w.]+)"' )
+
+# Custom exception for requests which have no recorded response
+class CassetteMissError(Exception):
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    pass
+
+def toBytes( data ):
+
+    return data.encode( 'utf-8' ) if isinstance( data, str ) else bytes( data )
+
+# Replace secrets (passwords, access tokens, session tickets) with a placeholder
+def redact( xml ):
+
+    return redactPattern.sub( rb'<\1>REDACTED</\1>', toBytes( xml ) )
+
+# Redact, blank out timestamps and strip formatting whitespace from an envelope, so
+# the same request made from either sample (or with a different session ticket, or
+# at a different time) gives the same key
+def normalizeEnvelope( envelope ):
+
+    normalized = timestampPattern.sub( rb'<\1>TIMESTAMP</\1>', redact( envelope ) )
+
+    return re.sub( rb'>\s+<', b'><', normalized ).strip()
+
+# Return the API operation name from an envelope, e.g. 'meeting.GetMeeting'
+def operationName( envelope ):
+
+    match = operationPattern.search( envelope )
+
+    return match.group( 1 ).decode() if match else ''
+
+# Index key for a normalized envelope
+def envelopeKey( normalized ):
+
+    return hashlib.sha1( normalized ).digest()
+
+class CassetteWriter:
+
+    # Recordings already in the cassette file are kept, and merged with new ones on save
+    def __init__( self, fileName ):
+
+        self.fileName = fileName
+        self.records = { }
+        self.lock = threading.Lock()
+
+        if os.path.exists( fileName ):
+            cassette = Cassette( fileName )
+
+            for status, envelope, content in cassette.records():
+                self.records[ envelopeKey( envelope ) ] = ( status, envelope, content )
+
+            cassette.close()
+
+    def record( self, envelope, status, content ):
+
+        normalized = normalizeEnvelope( envelope )
+
+        with self.lock:
+            # A later recording of the same request replaces the earlier one
+            self.records.pop( envelopeKey( normalized ), None )
+            self.records[ envelopeKey( normalized ) ] = ( status, normalized, redact( content ) )
+
+    def save( self ):
+
+        with self.lock:
+            records = list( self.records.items() )
+
+        offset = HEADER.size
+        chunks = [ ]
+        index = { }
+
+        for key, ( status, envelope, content ) in records:
+
+            chunks.append( RECORD.pack( status, len( envelope ), len( content ) ) )
+            chunks.append( envelope )
+            chunks.append( content )
+
+            index[ key ] = offset
+
+            offset += RECORD.size + len( envelope ) + len( content )
+
+        chunks.append( COUNT.pack( len( index ) ) )
+        chunks.extend( ENTRY.pack( key, index[ key ] ) for key in sorted( index ) )
+
+        tempName = self.fileName + '.tmp'
+
+        with open( tempName, 'wb' ) as cassetteFile:
+            cassetteFile.write( HEADER.pack( MAGIC, len( records ), offset ) )
+            cassetteFile.write( b''.join( chunks ) )
+
+        os.replace( tempName, self.fileName )
+
+class Cassette:
+
+    def __init__( self, fileName ):
+
+        with open( fileName, 'rb' ) as cassetteFile:
+            self.data = mmap.mmap( cassetteFile.fileno(), 0, access = mmap.ACCESS_READ )
+
+        magic, self.recordCount, indexOffset = HEADER.unpack_from( self.data, 0 )
+
+        if magic != MAGIC:
+            raise ValueError( f'{fileName} is not a cassette file, or is from an older version' )
+
+        self.entryCount, = COUNT.unpack_from( self.data, indexOffset )
+        self.indexStart = indexOffset + COUNT.size
+
+    # Binary search the sorted index, returning the record offset or None
+    def find( self, key ):
+
+        low, high = 0, self.entryCount
+
+        while low < high:
+
+            middle = ( low + high ) // 2
+            entryKey, offset = ENTRY.unpack_from( self.data, self.indexStart + middle * ENTRY.size )
+
+            if entryKey == key:
+                return offset
+            if entryKey < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return None
+
+    # Return the ( status, response content ) recorded for an envelope
+    def lookup( self, envelope ):
+
+        normalized = normalizeEnvelope( envelope )
+
+        offset = self.find( envelopeKey( normalized ) )
+
+        if offset is None:
+            raise CassetteMissError( operationName( normalized ) )
+
+        status, envelopeLength, contentLength = RECORD.unpack_from( self.data, offset )
+        start = offset + RECORD.size + envelopeLength
+
+        return status, self.data[ start : start + contentLength ]
+
+    # Yield ( status, normalized envelope, response content ) for every record
+    def records( self ):
+
+        offset = HEADER.size
+
+        for _ in range( self.recordCount ):
+
+            status, envelopeLength, contentLength = RECORD.unpack_from( self.data, offset )
+            start = offset + RECORD.size
+
+            yield ( status, self.data[ start : start + envelopeLength ],
+                    self.data[ start + envelopeLength : start + envelopeLength + contentLength ] )
+
+            offset = start + envelopeLength + contentLength
+
+    def close( self ):
+
+        self.data.close()
+
+# Wraps a transport (anything with a requests-style post() method, e.g. the
+# requests module or an Authlib remote app) and records the traffic through it
+class RecordingTransport:
+
+    def __init__( self, transport, fileName ):
+
+        self.transport = transport
+        self.writer = CassetteWriter( fileName )
+
+    def post( self, url, data = None, **kwargs ):
+
+        response = self.transport.post( url, data = data, **kwargs )
+
+        self.writer.record( data, response.status_code, response.content )
+
+        return response
+
+# Serves recorded responses in place of a real transport
+class ReplayTransport:
+
+    def __init__( self, fileName ):
+
+        self.cassette = Cassette( fileName )
+
+    def post( self, url, data = None, **kwargs ):
+
+        status, content = self.cassette.lookup( data )
+
+        response = requests.models.Response()
+        response.status_code = status
+        response._content = content
+        response.url = url
+        response.headers[ 'Content-Type' ] = 'text/xml;charset=UTF-8'
+
+        # Enough of the request for the samples' debug output
+        response.request = requests.models.PreparedRequest()
+        response.request.headers = kwargs.get( 'headers' ) or { }
+        response.request.body = data
+
+        return response
+
+# Return the transport to use for API requests, based on CASSETTE_MODE in .env
+#   transport : the normal (live) transport
+def transportFromEnv( transport ):
+
+    mode = os.getenv( 'CASSETTE_MODE' )
+    fileName = os.getenv( 'CASSETTE_FILE' ) or DEFAULT_CASSETTE_FILE
+
+    if mode == 'record':
+        recorder = RecordingTransport( transport, fileName )
+        atexit.register( recorder.writer.save )
+        return recorder
+
+    if mode == 'replay':
+        return ReplayTransport( fileName )
+
+    return transport
@@ -0,0 +1,433 @@
+# Webex Meetings change feed service, demonstrating how a single XML API poller
+# can serve many downstream consumers
+
+# The service polls LstsummaryMeeting for each configured host, compares the
+# result with the previous snapshot, and pushes 'created', 'updated' and
+# 'deleted' meeting events to subscribers via:
+
+#   * Server-Sent Events : GET /events (supports Last-Event-ID on reconnect)
+#   * Webhooks : POST /webhooks with JSON { "url": "https://..." } to subscribe,
+#       DELETE /webhooks with the same body to unsubscribe
+
+# GET /snapshot returns the current upcoming meetings for all hosts.
+
+# Every endpoint requires the shared secret from FEED_API_TOKEN, sent as an
+# 'Authorization: Bearer <token>' header or, for EventSource clients (which can't
+# set headers), a ?token=<token> query parameter.  Webhook URLs must be on a host
+# listed in FEED_WEBHOOK_ALLOWED_HOSTS, so the service can't be used to send
+# requests to arbitrary (e.g. internal) addresses.
+
+# Each host is polled on an adaptive interval: more often when one of its meetings
+# is about to start or its meetings recently changed, backing off for idle hosts.
+# Due hosts are polled on a small thread pool, so one slow host doesn't hold up
+# the polls of the others.
+# Consumers subscribe here rather than each polling Webex, so the number of API
+# calls no longer grows with the number of consumers.
+
+# Configuration and setup:
+
+#   1. Edit .env to provide the Webex site/user credentials as for sampleFlow.py.
+#        To poll hosts other than WEBEXID, the user must be a site admin
+
+#   2. Set FEED_HOSTS to a comma-separated list of host Webex IDs (default: WEBEXID),
+#        and optionally FEED_MIN_INTERVAL / FEED_MAX_INTERVAL (seconds) and
+#        FEED_POLL_THREADS (number of hosts polled at once, default 4)
+
+#   3. Set FEED_API_TOKEN to a long random secret, and FEED_WEBHOOK_ALLOWED_HOSTS to a
+#        comma-separated list of host names webhooks may be sent to.  If either is
+#        empty, the corresponding requests are refused
+
+#   4. Launch with:  FLASK_APP=changeFeed.py flask run
+#        (or use the 'Launch changeFeed.py' option in VS Code)
+
+# Copyright (c) 2019 Cisco and/or its affiliates.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from flask import Flask, Response, jsonify, request, stream_with_context
+import collections
+import concurrent.futures
+import datetime
+import heapq
+import hmac
+import json
+import os
+import queue
+import threading
+import time
+import urllib.parse
+
+import requests
+
+import decodePool
+import latencyBudget
+import sampleFlow
+from sampleFlow import SendRequestError
+
+# Poll interval bounds, in seconds
+MIN_INTERVAL = float( os.getenv( 'FEED_MIN_INTERVAL' ) or 30 )
+MAX_INTERVAL = float( os.getenv( 'FEED_MAX_INTERVAL' ) or 900 )
+
+# Number of hosts polled at the same time
+POLL_THREADS = int( os.getenv( 'FEED_POLL_THREADS' ) or 4 )
+
+# Number of recent events kept for SSE clients reconnecting with Last-Event-ID
+HISTORY_SIZE = 1000
+
+# Seconds between SSE keep-alive comments
+KEEPALIVE_INTERVAL = 15
+
+DATE_FORMAT = '%m/%d/%Y %H:%M:%S'
+
+# Return True if the error means the session ticket has expired or is invalid,
+# i.e. authenticating again may fix it
+def isTicketError( err ):
+
+    if not isinstance( err, SendRequestError ) or err.result.startswith( 'HTTP' ):
+        return False
+
+    reason = str( err.reason ).lower()
+
+    return 'ticket' in reason and ( 'expired' in reason or 'invalid' in reason )
+
+# Return True if webhooks may be sent to the URL's host
+def webhookAllowed( url ):
+
+    allowedHosts = { host.strip().lower() for host in ( os.getenv( 'FEED_WEBHOOK_ALLOWED_HOSTS' ) or '' ).split( ',' )
+                     if host.strip() }
+
+    parts = urllib.parse.urlsplit( url )
+
+    return parts.scheme in ( 'http', 'https' ) and ( parts.hostname or '' ).lower() in allowedHosts
+
+# Return the datetime of the next meeting start after now, or None
+def nextStartDate( meetings, now ):
+
+    startDates = [ datetime.datetime.strptime( meeting[ 'startDate' ], DATE_FORMAT )
+                   for meeting in meetings.values() if meeting[ 'startDate' ] ]
+
+    upcoming = [ startDate for startDate in startDates if startDate > now ]
+
+    return min( upcoming ) if upcoming else None
+
+# Compare two snapshots ( meetingKey -> meeting dict ), returning a list of
+# ( eventType, meeting ) tuples
+#   Meetings missing from the new snapshot because they have started are not
+#   reported as deleted, as LstsummaryMeeting only lists upcoming meetings
+def diffSnapshots( previous, current, now ):
+
+    changes = [ ]
+
+    for meetingKey, meeting in current.items():
+
+        if meetingKey not in previous:
+            changes.append( ( 'created', meeting ) )
+        elif previous[ meetingKey ] != meeting:
+            changes.append( ( 'updated', meeting ) )
+
+    for meetingKey, meeting in previous.items():
+
+        if meetingKey in current:
+            continue
+
+        if not meeting[ 'startDate' ] or datetime.datetime.strptime( meeting[ 'startDate' ], DATE_FORMAT ) > now:
+            changes.append( ( 'deleted', meeting ) )
+
+    return changes
+
+# Work out how long to wait before polling a host again
+#   changed : whether the last poll found any changes
+def nextInterval( interval, changed, nextStart, now ):
+
+    # Back off while the host is idle, poll at the minimum interval after a change
+    interval = MIN_INTERVAL if changed else min( interval * 2, MAX_INTERVAL )
+
+    # Poll at least twice in the run-up to the next meeting start, as last-minute
+    # edits and cancellations are most likely then
+    if nextStart:
+        untilStart = ( nextStart - now ).total_seconds()
+        interval = min( interval, max( untilStart / 2, MIN_INTERVAL ) )
+
+    return interval
+
+class ChangeFeed:
+
+    def __init__( self, hostWebExIds ):
+
+        self.hostWebExIds = hostWebExIds
+        self.snapshots = { hostWebExId: None for hostWebExId in hostWebExIds }
+        self.intervals = { hostWebExId: MIN_INTERVAL for hostWebExId in hostWebExIds }
+
+        self.sessionSecurityContext = None
+        self.pollCount = 0
+
+        # Events are numbered, so SSE clients can resume from the last one they saw
+        self.eventId = 0
+        self.history = collections.deque( maxlen = HISTORY_SIZE )
+
+        self.sseQueues = set( )
+        self.webhooks = set( )
+        self.webhookExecutor = concurrent.futures.ThreadPoolExecutor( 4 )
+        self.pollExecutor = concurrent.futures.ThreadPoolExecutor( POLL_THREADS )
+
+        # Polls completed by the pool, as ( next poll time, hostWebExId ), for run() to reschedule
+        self.polled = queue.Queue()
+
+        self.lock = threading.Lock()
+        self.authLock = threading.Lock()
+        self.stopEvent = threading.Event()
+        self.thread = threading.Thread( target = self.run, daemon = True )
+
+    def start( self ):
+
+        self.thread.start()
+
+    def stop( self ):
+
+        self.stopEvent.set()
+        self.thread.join()
+        self.pollExecutor.shutdown()
+        self.webhookExecutor.shutdown()
+
+    def authenticate( self, deadline = None ):
+
+        self.sessionSecurityContext = sampleFlow.AuthenticateUser(
+            os.getenv( 'SITENAME' ),
+            os.getenv( 'WEBEXID' ),
+            os.getenv( 'PASSWORD' ),
+            os.getenv( 'ACCESS_TOKEN' ),
+            deadline = deadline
+        )
+
+    # Fetch the host's upcoming meetings, as meetingKey -> meeting dict
+    def fetchMeetings( self, hostWebExId ):
+
+        # A single deadline covers authenticating (if needed) and fetching every page,
+        # so one slow host can't stall polling of the others for long
+        deadline = latencyBudget.operationDeadline( 'ListHostMeetings' )
+
+        # Hosts are polled in parallel, so only the first poll authenticates
+        with self.authLock:
+            if self.sessionSecurityContext is None:
+                self.authenticate( deadline )
+
+        startDateStart = datetime.datetime.now().strftime( DATE_FORMAT )
+
+        try:
+            records = sampleFlow.ListHostMeetings( self.sessionSecurityContext, hostWebExId, startDateStart,
+                deadline = deadline )
+
+        # The session ticket may have expired - authenticate again and retry once
+        except SendRequestError as err:
+            if not isTicketError( err ):
+                raise
+            self.authenticate( deadline )
+            records = sampleFlow.ListHostMeetings( self.sessionSecurityContext, hostWebExId, startDateStart,
+                deadline = deadline )
+
+        with self.lock:
+            self.pollCount += 1
+
+        meetings = [ dict( zip( decodePool.MEETING_FIELDS, record ) ) for record in records ]
+
+        return { meeting[ 'meetingKey' ]: meeting for meeting in meetings }
+
+    # Poll one host, publish any changes, and return the delay until its next poll
+    def poll( self, hostWebExId ):
+
+        current = self.fetchMeetings( hostWebExId )
+        now = datetime.datetime.now()
+
+        previous = self.snapshots[ hostWebExId ]
+        self.snapshots[ hostWebExId ] = current
+
+        # The first poll just establishes the baseline snapshot
+        changes = diffSnapshots( previous, current, now ) if previous is not None else [ ]
+
+        for eventType, meeting in changes:
+            self.publish( eventType, hostWebExId, meeting )
+
+        self.intervals[ hostWebExId ] = nextInterval( self.intervals[ hostWebExId ],
+            bool( changes ), nextStartDate( current, now ), now )
+
+        return self.intervals[ hostWebExId ]
+
+    # Poll one host on the pool, then queue it to be rescheduled
+    def pollHost( self, hostWebExId ):
+
+        try:
+            interval = self.poll( hostWebExId )
+
+        # Any failure must not stop polling of the host - log it, and back off so a
+        # persistently failing host isn't hammered
+        except Exception as err:
+            print( f'Error polling {hostWebExId}: {err!r}' )
+            interval = min( self.intervals[ hostWebExId ] * 2, MAX_INTERVAL )
+            self.intervals[ hostWebExId ] = interval
+
+        self.polled.put( ( time.monotonic() + interval, hostWebExId ) )
+
+    # Scheduling loop - each host waiting for its next poll is kept in a heap ordered
+    # by poll time, and is handed to the poll pool when due.  A host is only put back
+    # on the heap once its poll completes, so it's never polled twice at once
+    def run( self ):
+
+        schedule = [ ( time.monotonic(), hostWebExId ) for hostWebExId in self.hostWebExIds ]
+        heapq.heapify( schedule )
+
+        while not self.stopEvent.is_set():
+
+            now = time.monotonic()
+
+            if schedule and schedule[ 0 ][ 0 ] <= now:
+                dueTime, hostWebExId = heapq.heappop( schedule )
+                self.pollExecutor.submit( self.pollHost, hostWebExId )
+                continue
+
+            # Wait for the next host to come due or a poll to complete, waking at
+            # least once a second to check for stop()
+            timeout = min( schedule[ 0 ][ 0 ] - now, 1 ) if schedule else 1
+
+            try:
+                heapq.heappush( schedule, self.polled.get( timeout = timeout ) )
+            except queue.Empty:
+                pass
+
+    def publish( self, eventType, hostWebExId, meeting ):
+
+        with self.lock:
+            self.eventId += 1
+            event = { 'id': self.eventId, 'type': eventType, 'host': hostWebExId, 'meeting': meeting }
+            self.history.append( event )
+
+            for sseQueue in self.sseQueues:
+                sseQueue.put( event )
+
+            webhooks = list( self.webhooks )
+
+        for url in webhooks:
+            self.webhookExecutor.submit( self.sendWebhook, url, event )
+
+    def sendWebhook( self, url, event ):
+
+        try:
+            # Redirects aren't followed, as they could lead off the allowed hosts
+            requests.post( url, json = event, timeout = 10, allow_redirects = False ).raise_for_status()
+        except requests.exceptions.RequestException as err:
+            print( f'Error sending webhook to {url}: {err}' )
+
+    # Register an SSE client, returning its queue pre-loaded with any events
+    # after lastEventId
+    def subscribe( self, lastEventId = None ):
+
+        sseQueue = queue.Queue()
+
+        with self.lock:
+            if lastEventId is not None:
+                for event in self.history:
+                    if event[ 'id' ] > lastEventId:
+                        sseQueue.put( event )
+
+            self.sseQueues.add( sseQueue )
+
+        return sseQueue
+
+    def unsubscribe( self, sseQueue ):
+
+        with self.lock:
+            self.sseQueues.discard( sseQueue )
+
+# Instantiate the Flask application and start polling
+app = Flask(__name__)
+
+hosts = [ host.strip() for host in ( os.getenv( 'FEED_HOSTS' ) or os.getenv( 'WEBEXID' ) or '' ).split( ',' ) if host.strip() ]
+
+feed = ChangeFeed( hosts )
+feed.start()
+
+# Require the FEED_API_TOKEN shared secret on every request
+@app.before_request
+def checkToken():
+
+    expected = os.getenv( 'FEED_API_TOKEN' )
+
+    if not expected:
+        return jsonify( { 'error': 'FEED_API_TOKEN is not configured' } ), 503
+
+    authorization = request.headers.get( 'Authorization', '' )
+    token = authorization[ 7: ] if authorization.startswith( 'Bearer ' ) else request.args.get( 'token', '' )
+
+    if not hmac.compare_digest( token.encode( 'utf-8' ), expected.encode( 'utf-8' ) ):
+        return jsonify( { 'error': 'Missing or invalid token' } ), 401
+
+# Stream change events to the client as Server-Sent Events
+@app.route('/events')
+def events():
+
+    lastEventId = request.headers.get( 'Last-Event-ID' )
+
+    sseQueue = feed.subscribe( int( lastEventId ) if lastEventId and lastEventId.isdigit() else None )
+
+    def stream():
+
+        try:
+            while True:
+                try:
+                    event = sseQueue.get( timeout = KEEPALIVE_INTERVAL )
+                except queue.Empty:
+                    # SSE comment line, keeps proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+                    continue
+
+                yield f'id: { event[ "id" ] }\nevent: { event[ "type" ] }\ndata: { json.dumps( event ) }\n\n'
+
+        finally:
+            feed.unsubscribe( sseQueue )
+
+    return Response( stream_with_context( stream() ), mimetype = 'text/event-stream',
+        headers = { 'Cache-Control': 'no-cache' } )
+
+# Subscribe / unsubscribe a webhook URL
+@app.route('/webhooks', methods = [ 'POST', 'DELETE' ])
+def webhooks():
+
+    body = request.get_json( silent = True )
+    url = body.get( 'url' ) if isinstance( body, dict ) else None
+
+    if not isinstance( url, str ) or not url.startswith( ( 'http://', 'https://' ) ):
+        return jsonify( { 'error': 'Request body must be JSON with an http(s) "url"' } ), 400
+
+    if request.method == 'POST' and not webhookAllowed( url ):
+        return jsonify( { 'error': 'Webhook host is not in FEED_WEBHOOK_ALLOWED_HOSTS' } ), 403
+
+    with feed.lock:
+        if request.method == 'POST':
+            feed.webhooks.add( url )
+        else:
+            feed.webhooks.discard( url )
+
+    return jsonify( { 'url': url, 'subscribed': request.method == 'POST' } )
+
+# Return the latest snapshot of upcoming meetings for each host
+@app.route('/snapshot')
+def snapshot():
+
+    return jsonify( {
+        'hosts': { hostWebExId: list( meetings.values() ) if meetings is not None else None
+                   for hostWebExId, meetings in feed.snapshots.items() },
+        'lastEventId': feed.eventId,
+        'pollCount': feed.pollCount
+    } )
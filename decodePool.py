@@ -0,0 +1,102 @@
+# Optional process pool for decoding large XML API list responses
+
+# Parsing a LstsummaryMeeting or LstMeetingAttendee response with thousands of
+# entries (lxml, plus a find() per field) is CPU-bound, and under threads the GIL
+# serialises it behind the network I/O.  A DecodePool hands the raw response
+# bytes to worker processes instead, which return compact batches of plain
+# tuples - much cheaper to pass back between processes than lxml trees.
+
+# The decode functions are kept free of imports from the samples, so worker
+# processes only need lxml.
+
+# Copyright (c) 2019 Cisco and/or its affiliates.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import concurrent.futures
+
+from lxml import etree
+
+# Fields (in tuple order) of the records returned by each decoder
+MEETING_FIELDS = ( 'meetingKey', 'confName', 'meetingType', 'hostWebExID', 'startDate', 'duration', 'status' )
+ATTENDEE_FIELDS = ( 'attendeeId', 'name', 'email', 'role', 'type' )
+MEETING_TYPE_FIELDS = ( 'meetingTypeID', 'name', 'displayName', 'productCodePrefix', 'active' )
+
+# Decode a list response: returns ( result, reason, total, records ), where records
+# is a list of tuples with the text of each path under the matching elements
+#   itemTag : local name of the list item element, e.g. 'meeting'
+#   paths : find() paths, relative to the item element
+def decodeList( content, itemTag, paths ):
+
+    message = etree.fromstring( content )
+
+    result = message.findtext( '{*}header/{*}response/{*}result' )
+
+    if result != 'SUCCESS':
+        return result, message.findtext( '{*}header/{*}response/{*}reason' ), 0, [ ]
+
+    records = [ tuple( item.findtext( path ) for path in paths )
+                for item in message.iter( '{*}' + itemTag ) ]
+
+    # Total matching records on the server, for paging - defaults to what we got
+    total = message.findtext( '{*}body/{*}bodyContent/{*}matchingRecords/{*}total' )
+
+    return result, None, int( total ) if total else len( records ), records
+
+# Decoder for LstsummaryMeeting responses, records as per MEETING_FIELDS
+def decodeMeetings( content ):
+
+    return decodeList( content, 'meeting', [ '{*}' + field for field in MEETING_FIELDS ] )
+
+# Decoder for LstMeetingAttendee responses, records as per ATTENDEE_FIELDS
+def decodeAttendees( content ):
+
+    return decodeList( content, 'attendee',
+        [ '{*}attendeeId', '{*}person/{*}name', '{*}person/{*}email', '{*}role', '{*}person/{*}type' ] )
+
+# Decoder for LstMeetingType responses, records as per MEETING_TYPE_FIELDS
+def decodeMeetingTypes( content ):
+
+    return decodeList( content, 'meetingType', [ '{*}' + field for field in MEETING_TYPE_FIELDS ] )
+
+class DecodePool:
+
+    # workers : number of worker processes, or 0 to decode in the calling thread
+    def __init__( self, workers = 0 ):
+
+        self.workers = workers
+        self.executor = concurrent.futures.ProcessPoolExecutor( workers ) if workers else None
+
+    # Run decoder( content ), in a worker process if the pool has any
+    def decode( self, decoder, content ):
+
+        if self.executor is None:
+            return decoder( content )
+
+        return self.executor.submit( decoder, content ).result()
+
+    def close( self ):
+
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def __enter__( self ):
+
+        return self
+
+    def __exit__( self, *exc ):
+
+        self.close()
@@ -0,0 +1,183 @@
+# Latency budgets, deadlines and hedged requests for XML API calls
+
+# Every API request is given a deadline, from a per-operation latency budget.
+# The connect/read timeouts passed to requests are derived from the time left,
+# so a stalled Webex response can no longer hang a worker forever.
+
+# Multi-step flows (e.g. AuthenticateUser, then LstsummaryMeeting, then GetMeeting)
+# can create a Deadline for the whole flow and pass it to each call - each
+# request then gets the smaller of its own budget and the time left in the flow.
+
+# Optionally, idempotent reads can be hedged: if no response has arrived after
+# HEDGE_DELAY seconds, a second identical request is sent and whichever
+# completes first is used.  This trims tail latency at the cost of some extra calls.
+
+# Configure via .env:
+
+#   LATENCY_BUDGET_<OPERATION> : budget in seconds for an operation or flow,
+#       e.g. LATENCY_BUDGET_GETUSER=5
+#   LATENCY_BUDGET : budget for any operation or flow not listed in DEFAULT_BUDGETS
+#       below, and without its own setting (default 30).  It doesn't override
+#       DEFAULT_BUDGETS - use LATENCY_BUDGET_<OPERATION> to change those
+#   CONNECT_TIMEOUT : maximum TCP connect timeout in seconds (default 3.05)
+#   HEDGE_DELAY : seconds before hedging an idempotent read (leave empty to disable)
+
+# Copyright (c) 2019 Cisco and/or its affiliates.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import concurrent.futures
+import os
+import threading
+import time
+
+import requests
+
+# Default budgets in seconds, for single operations and multi-step flows
+DEFAULT_BUDGETS = {
+    'AuthenticateUser': 10,
+    'GetUser': 5,
+    'GetMeeting': 5,
+    'GetSite': 10,
+    'LstMeetingType': 10,
+    'CreateMeeting': 15,
+    'DelMeeting': 10,
+    'LstsummaryMeeting': 20,
+    'LstMeetingAttendee': 20,
+    'ListHostMeetings': 120,
+    'ListMeetingAttendees': 120,
+    'GetUserFlow': 20
+}
+
+# Read-only operations which are safe to send twice
+HEDGED_OPERATIONS = { 'GetUser', 'GetMeeting', 'LstsummaryMeeting' }
+
+# Runs the second (hedge) requests only, so hedging can't add more than a bounded
+# number of extra requests in flight
+hedgeExecutor = concurrent.futures.ThreadPoolExecutor( 16 )
+
+# Raised when a deadline expires before a request could be sent
+#   Subclasses the requests Timeout exception, so existing handling of
+#   timeouts applies to it too
+class DeadlineExceededError(requests.exceptions.Timeout):
+
+    def __init__(self, operation):
+        super().__init__( f'Deadline exceeded before sending {operation}' )
+        self.operation = operation
+
+    pass
+
+# Return the latency budget in seconds for an operation or flow: its own
+# LATENCY_BUDGET_<OPERATION> setting, else its DEFAULT_BUDGETS entry, else LATENCY_BUDGET
+def operationBudget( operation ):
+
+    # Settings are read when used rather than on import, as the samples load
+    # .env after their imports
+    budget = os.getenv( 'LATENCY_BUDGET_' + operation.upper() )
+
+    if budget:
+        return float( budget )
+
+    return DEFAULT_BUDGETS.get( operation, float( os.getenv( 'LATENCY_BUDGET' ) or 30 ) )
+
+# Return the hedging delay in seconds, or None if hedging is disabled
+def hedgeDelay():
+
+    delay = os.getenv( 'HEDGE_DELAY' )
+
+    return float( delay ) if delay else None
+
+class Deadline:
+
+    # budget : seconds from now until the deadline
+    def __init__( self, budget ):
+
+        self.expires = time.monotonic() + budget
+
+    def remaining( self ):
+
+        return max( self.expires - time.monotonic(), 0 )
+
+    # Return a deadline no later than this one, and no more than budget seconds away
+    def child( self, budget ):
+
+        deadline = Deadline( budget )
+        deadline.expires = min( deadline.expires, self.expires )
+
+        return deadline
+
+    # Return a requests ( connect, read ) timeout tuple from the time left
+    #   Note the read timeout applies to each socket read rather than the whole
+    #   response, but a stalled response is still cut off
+    def timeout( self, operation = '' ):
+
+        remaining = self.remaining()
+
+        if remaining <= 0:
+            raise DeadlineExceededError( operation )
+
+        return ( min( float( os.getenv( 'CONNECT_TIMEOUT' ) or 3.05 ), remaining ), remaining )
+
+# Return the deadline for a single operation
+#   deadline : (optional) the deadline of the flow the operation is part of
+def operationDeadline( operation, deadline = None ):
+
+    budget = operationBudget( operation )
+
+    return deadline.child( budget ) if deadline else Deadline( budget )
+
+# Call send() in a new thread, returning a Future for its result
+#   The first request of a hedged call starts at once on its own thread, rather than
+#   queueing in hedgeExecutor behind other callers' hedges, while leaving the
+#   calling thread free to return the hedge's response if that arrives first
+def startThread( send ):
+
+    future = concurrent.futures.Future()
+
+    def run():
+        try:
+            future.set_result( send() )
+        except Exception as err:
+            future.set_exception( err )
+
+    threading.Thread( target = run, daemon = True ).start()
+
+    return future
+
+# Call send(), and if it hasn't returned after delay seconds (and there's time
+# left before the deadline), call it again in parallel
+# Returns the first successful result, or raises the first error if both fail
+def hedgedCall( send, deadline, delay = None ):
+
+    delay = hedgeDelay() if delay is None else delay
+
+    futures = [ startThread( send ) ]
+
+    done, pending = concurrent.futures.wait( futures, timeout = delay )
+
+    if not done and deadline.remaining() > 0:
+        futures.append( hedgeExecutor.submit( send ) )
+
+    error = None
+
+    for future in concurrent.futures.as_completed( futures ):
+
+        try:
+            return future.result()
+        except Exception as err:
+            error = error or err
+
+    raise error
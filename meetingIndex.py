@@ -0,0 +1,118 @@
+# Persistent local index used to make CreateMeeting requests idempotent
+
+# Each meeting spec (site, confName, host, startDate, duration) is reduced to a
+# stable idempotency key, and the meetingKey returned by Webex for that spec
+# is saved to a small JSON file.  A retried bulk run can then look up meetings
+# it already created instead of sending CreateMeeting again.
+
+# A key is marked PENDING before CreateMeeting is sent, so if the run is interrupted
+# before the meetingKey comes back, a retried run knows to check whether the
+# meeting was created before sending CreateMeeting again.
+
+# Entries are removed when the meeting is deleted via DelMeeting( ..., meetingIndex )
+
+# Each update re-reads the file and merges the change into it, so several runs
+# sharing an index file don't overwrite each other's entries
+
+# The index file location can be set via MEETING_INDEX_FILE in .env
+
+# Copyright (c) 2019 Cisco and/or its affiliates.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import hashlib
+import json
+import os
+import threading
+
+DEFAULT_INDEX_FILE = '.meetingIndex.json'
+
+# Index value for a meeting whose CreateMeeting request was sent, but whose
+# meetingKey was never received
+PENDING = 'pending'
+
+# Build the idempotency key for a meeting spec
+#   The site and host are compared case-insensitively, as Webex IDs are email-like
+def meetingSpecKey( siteName, confName, hostWebExId, startDate, duration ):
+
+    spec = '\n'.join( [ siteName.lower(), confName, hostWebExId.lower(), startDate, str( duration ) ] )
+
+    return hashlib.sha256( spec.encode( 'utf-8' ) ).hexdigest()
+
+class MeetingIndex:
+
+    # fileName : (optional) path of the JSON index file
+    def __init__( self, fileName = None ):
+
+        self.fileName = fileName or os.getenv( 'MEETING_INDEX_FILE' ) or DEFAULT_INDEX_FILE
+        self.lock = threading.Lock()
+
+        # One lock per idempotency key, held while a meeting is being created, so
+        # two threads creating the same spec can't both miss the index
+        self.keyLocks = { }
+
+        self.entries = self.readEntries()
+
+    def readEntries( self ):
+
+        try:
+            with open( self.fileName, 'r', encoding = 'utf-8' ) as indexFile:
+                return json.load( indexFile )
+        except FileNotFoundError:
+            return { }
+
+    # Return the lock for an idempotency key
+    def keyLock( self, key ):
+
+        with self.lock:
+            return self.keyLocks.setdefault( key, threading.Lock() )
+
+    # Return the meetingKey (or PENDING) saved for the idempotency key, or None
+    def get( self, key ):
+
+        return self.entries.get( key )
+
+    # Save the meetingKey (or PENDING) for the idempotency key, and write the index to disk
+    def put( self, key, meetingKey ):
+
+        with self.lock:
+            self.entries = self.readEntries()
+            self.entries[ key ] = meetingKey
+            self.save()
+
+    # Forget a meeting, e.g. after it has been deleted with DelMeeting
+    def discard( self, meetingKey ):
+
+        with self.lock:
+            self.entries = self.readEntries()
+            stale = [ key for key, value in self.entries.items() if value == meetingKey ]
+
+            for key in stale:
+                del self.entries[ key ]
+
+            if stale:
+                self.save()
+
+    # Write to a temporary file then rename it over the index, so an interrupted
+    # run never leaves a truncated index behind
+    def save( self ):
+
+        tempName = self.fileName + '.tmp'
+
+        with open( tempName, 'w', encoding = 'utf-8' ) as indexFile:
+            json.dump( self.entries, indexFile, indent = 1, sort_keys = True )
+
+        os.replace( tempName, self.fileName )
@@ -71,6 +71,9 @@ from furl import furl
 import json
 import os
 
+import cassette
+import latencyBudget
+
 # Edit .env file to specify your Webex integration client ID / secret
 from dotenv import load_dotenv
 load_dotenv( override=True ) # Prefer variables in .env file
@@ -156,6 +159,10 @@ oauth.register(
 
 # The following section handles the Webex Meetings XML API calls
 
+# Object used to POST requests - normally the webex RemoteApplication, but can record to or
+# replay from a cassette file (see cassette.py and CASSETTE_MODE in .env)
+transport = cassette.transportFromEnv( oauth.webex )
+
 # Custom exception for errors when sending Meetings API requests
 class SendRequestError(Exception):
 
@@ -168,12 +175,31 @@ class SendRequestError(Exception):
 # Generic function for sending Meetings XML API requests
 #   envelope : the full XML content of the request
 #   debug : (optional) print the XML of the request / response
-def sendRequest( envelope, debug = False ):
+#   operation : (optional) the API operation name, used to look up its latency budget
+#   deadline : (optional) latencyBudget.Deadline of the flow this request is part of
+def sendRequest( envelope, debug = False, operation = '', deadline = None ):
+
+    # The request must complete within the operation's budget (and the flow's deadline)
+    deadline = latencyBudget.operationDeadline( operation, deadline )
 
     # Use the webex_meetings RemoteApplication object to POST the XML envelope to the Meetings API endpoint
-    # Note, this object is based on the Python requests library object and can accept similar kwargs
+    # Note, this object is based on the Python requests library object and can accept similar kwargs,
+    # including the connect/read timeouts from the time left before the deadline
     headers = { 'Content-Type': 'application/xml'}
-    response = oauth.webex.post( url = '', data = envelope, headers = headers )
+
+    # The token is read from the session here and passed explicitly, as a hedged
+    # request is sent from other threads, outside the Flask request context
+    token = fetch_token()
+
+    def post():
+        return transport.post( url = '', data = envelope, headers = headers, token = token,
+            timeout = deadline.timeout( operation ) )
+
+    # Optionally hedge idempotent reads against a slow response
+    if operation in latencyBudget.HEDGED_OPERATIONS and latencyBudget.hedgeDelay() is not None:
+        response = latencyBudget.hedgedCall( post, deadline )
+    else:
+        response = post()
 
     if DEBUG:
         print( response.request.headers )
@@ -207,7 +233,7 @@ def sendRequest( envelope, debug = False ):
     # Return the XML message
     return message
 
-def WebexAuthenticateUser( siteName, webExId, accessToken ):
+def WebexAuthenticateUser( siteName, webExId, accessToken, deadline = None ):
 
     # Use f-string literal formatting to substitute {variables} into the XML string
     request = f'''<?xml version="1.0" encoding="UTF-8"?>
@@ -227,12 +253,12 @@ def WebexAuthenticateUser( siteName, webExId, accessToken ):
         </serv:message>'''
 
     # Make the API request
-    response = sendRequest( request )
+    response = sendRequest( request, operation = 'AuthenticateUser', deadline = deadline )
 
     # Return an object containing the security context info with sessionTicket
     return response.find( '{*}body/{*}bodyContent/{*}sessionTicket' ).text
 
-def WebexGetUser( sessionSecurityContext, webExId ):
+def WebexGetUser( sessionSecurityContext, webExId, deadline = None ):
 
     # Use f-string literal formatting to substitute {variables} into the XML template string
     request = f'''<?xml version="1.0" encoding="UTF-8"?>
@@ -250,7 +276,7 @@ def WebexGetUser( sessionSecurityContext, webExId ):
         '''
 
     # Make the API request
-    response = sendRequest( request, debug = True )
+    response = sendRequest( request, debug = True, operation = 'GetUser', deadline = deadline )
 
     # Return an object containing the security context info with sessionTicket
     return response
@@ -293,6 +319,9 @@ def authorize():
 @app.route('/GetUser')
 def GetUser():
 
+    # One deadline covers both the AuthenticateUser and GetUser requests
+    deadline = latencyBudget.operationDeadline( 'GetUserFlow' )
+
     if ( os.getenv( 'OAUTH_TYPE' ) == 'MEETINGS' ):
         sessionSecurityContext = f'''
             <securityContext>
@@ -308,7 +337,8 @@ def GetUser():
             sessionTicket = WebexAuthenticateUser(
                 os.getenv( 'SITENAME' ),
                 os.getenv( 'WEBEXID' ),
-                session[ 'token' ][ 'access_token' ]
+                session[ 'token' ][ 'access_token' ],
+                deadline = deadline
             )
 
             sessionSecurityContext = f'''
@@ -326,13 +356,18 @@ def GetUser():
 
             return response, 500
 
+        except requests.exceptions.Timeout as err:
+
+            return 'AuthenticateUser request timed out: ' + str( err ), 504
+
     # Call the function we created above, grabbing siteName and webExId from .env, and the
     # access_token from the token object in the session store
     try:
 
         reply = WebexGetUser(
             sessionSecurityContext,
-            os.getenv( 'WEBEXID' )
+            os.getenv( 'WEBEXID' ),
+            deadline = deadline
         )
 
     except SendRequestError as err:
@@ -343,6 +378,10 @@ def GetUser():
 
         return response, 500
 
+    except requests.exceptions.Timeout as err:
+
+        return 'Webex Meeting API request timed out: ' + str( err ), 504
+
     # Create a Flask Response object, with content of the pretty-printed XML text
     response = make_response( etree.tostring( reply, pretty_print = True, encoding = 'unicode' ) )
     
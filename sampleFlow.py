@@ -38,9 +38,19 @@
 # SOFTWARE.
 
 import requests
+import concurrent.futures
 import datetime
+import hashlib
 from lxml import etree
 import os
+import threading
+import time
+
+import cassette
+import decodePool
+import latencyBudget
+import siteCatalogue
+from meetingIndex import PENDING, MeetingIndex, meetingSpecKey
 
 # Edit .env file to specify your Webex site/user details
 from dotenv import load_dotenv
@@ -49,9 +59,17 @@ load_dotenv( override=True ) # Prefer variables in .env file
 # Enable Authlib and API request/response debug output in .env
 DEBUG = os.getenv('DEBUG_ENABLED') == 'True'
 
+# Object used to POST requests - normally the requests library, but can record to or
+# replay from a cassette file (see cassette.py and CASSETTE_MODE in .env)
+transport = cassette.transportFromEnv( requests )
+
 # Once the user is authenticated, the sessionTicket for all API requests will be stored here
 sessionSecurityContext = { }
 
+# Site catalogues loaded by LoadSiteCatalogue(), so each is loaded once per process
+loadedCatalogues = { }
+catalogueLock = threading.Lock()
+
 # Custom exception for errors when sending requests
 class SendRequestError(Exception):
 
@@ -63,13 +81,33 @@ class SendRequestError(Exception):
 
 # Generic function for sending XML API requests
 #   envelope : the full XML content of the request
-def sendRequest( envelope ):
+#   operation : (optional) the API operation name, used to look up its latency budget
+#   deadline : (optional) latencyBudget.Deadline of the flow this request is part of
+def sendRequest( envelope, operation = '', deadline = None ):
+
+    return parseResponse( sendRequestRaw( envelope, operation, deadline ) )
+
+# Send an XML API request, returning the raw response bytes without parsing
+#   Useful when the response will be decoded elsewhere, e.g. by a DecodePool
+def sendRequestRaw( envelope, operation = '', deadline = None ):
 
     if DEBUG:
         print( envelope )
 
-    # Use the requests library to POST the XML envelope to the Webex API endpoint
-    response = requests.post( 'https://api.webex.com/WBXService/XMLService', envelope )
+    # The request must complete within the operation's budget (and the flow's deadline)
+    deadline = latencyBudget.operationDeadline( operation, deadline )
+
+    # Use the requests library (via the transport) to POST the XML envelope to the Webex API endpoint,
+    # with connect/read timeouts from the time left before the deadline
+    def post():
+        return transport.post( 'https://api.webex.com/WBXService/XMLService', envelope,
+            timeout = deadline.timeout( operation ) )
+
+    # Optionally hedge idempotent reads against a slow response
+    if operation in latencyBudget.HEDGED_OPERATIONS and latencyBudget.hedgeDelay() is not None:
+        response = latencyBudget.hedgedCall( post, deadline )
+    else:
+        response = post()
 
     # Check for HTTP errors
     try: 
@@ -77,8 +115,13 @@ def sendRequest( envelope ):
     except requests.exceptions.HTTPError: 
         raise SendRequestError( 'HTTP ' + str(response.status_code), response.content.decode("utf-8") )
 
+    return response.content
+
+# Parse a response, raising SendRequestError if the result was not SUCCESS
+def parseResponse( content ):
+
     # Use the lxml ElementTree object to parse the response XML
-    message = etree.fromstring( response.content )
+    message = etree.fromstring( content )
 
     if DEBUG:
         print( etree.tostring( message, pretty_print = True, encoding = 'unicode' ) )   
@@ -96,7 +139,22 @@ def sendRequest( envelope ):
 
     return message
 
-def AuthenticateUser( siteName, webExId, password, accessToken ):
+# Decode a raw list response with one of the decodePool.py decoders, optionally
+# in a worker process, raising SendRequestError if the result was not SUCCESS
+# Returns ( total matching records, list of record tuples )
+def decodeResponse( content, decoder, pool = None ):
+
+    if pool is None:
+        result, reason, total, records = decoder( content )
+    else:
+        result, reason, total, records = pool.decode( decoder, content )
+
+    if result != 'SUCCESS':
+        raise SendRequestError( result, reason )
+
+    return total, records
+
+def AuthenticateUser( siteName, webExId, password, accessToken, deadline = None ):
 
     # If an access token is provided in .env, we'll use this form
     if ( accessToken ):
@@ -133,7 +191,7 @@ def AuthenticateUser( siteName, webExId, password, accessToken ):
             </serv:message>'''
 
     # Make the API request
-    response = sendRequest( request )
+    response = sendRequest( request, 'AuthenticateUser', deadline )
 
     # Return an object containing the security context info with sessionTicket
     return {
@@ -142,7 +200,7 @@ def AuthenticateUser( siteName, webExId, password, accessToken ):
             'sessionTicket': response.find( '{*}body/{*}bodyContent/{*}sessionTicket' ).text
             }
 
-def GetUser( sessionSecurityContext ):
+def GetUser( sessionSecurityContext, deadline = None ):
 
     request = f'''<?xml version="1.0" encoding="UTF-8"?>
         <serv:message xmlns:serv="http://www.webex.com/schemas/2002/06/service"
@@ -162,7 +220,7 @@ def GetUser( sessionSecurityContext ):
         </serv:message>'''
 
     # Make the API request
-    response = sendRequest( request )
+    response = sendRequest( request, 'GetUser', deadline )
 
     # Return an object containing the response
     return response
@@ -172,7 +230,9 @@ def CreateMeeting( sessionSecurityContext,
                    confName,
                    meetingType,
                    agenda,
-                   startDate ):
+                   startDate,
+                   duration = 20,
+                   deadline = None ):
 
     request = f'''<?xml version="1.0" encoding="UTF-8"?>
         <serv:message xmlns:serv="http://www.webex.com/schemas/2002/06/service"
@@ -206,7 +266,7 @@ def CreateMeeting( sessionSecurityContext,
                         <startDate>{startDate}</startDate>
                         <openTime>900</openTime>
                         <joinTeleconfBeforeHost>false</joinTeleconfBeforeHost>
-                        <duration>20</duration>
+                        <duration>{duration}</duration>
                         <timeZoneID>4</timeZoneID>
                     </schedule>
                     <telephony>
@@ -219,16 +279,167 @@ def CreateMeeting( sessionSecurityContext,
             </body>
         </serv:message>'''
 
-    response = sendRequest( request )
+    response = sendRequest( request, 'CreateMeeting', deadline )
 
     return response
 
+# Errors where we can't tell whether Webex acted on the request before it failed
+def isAmbiguousFailure( err ):
+
+    # The deadline expired before the request was sent, so it can't have been processed
+    if isinstance( err, latencyBudget.DeadlineExceededError ):
+        return False
+
+    if isinstance( err, ( requests.exceptions.Timeout, requests.exceptions.ConnectionError ) ):
+        return True
+
+    # HTTP 5xx - the request may have been processed before the error was returned
+    return isinstance( err, SendRequestError ) and err.result.startswith( 'HTTP 5' )
+
+# CreateMeeting wrapper which won't create the same meeting twice
+#   meetingIndex : a MeetingIndex object, persisting idempotency key -> meetingKey
+# Returns the meetingKey of the new (or previously created) meeting
+def CreateMeetingIdempotent( sessionSecurityContext,
+                             meetingIndex,
+                             meetingPassword,
+                             confName,
+                             meetingType,
+                             agenda,
+                             startDate,
+                             duration = 20,
+                             deadline = None ):
+
+    key = meetingSpecKey( sessionSecurityContext[ 'siteName' ], confName,
+        sessionSecurityContext[ 'webExId' ], startDate, duration )
+
+    # Only one thread at a time may check/create a given spec
+    with meetingIndex.keyLock( key ):
+
+        # If this spec was created on a previous run, no API request is needed
+        meetingKey = meetingIndex.get( key )
+
+        if meetingKey and meetingKey != PENDING:
+            return meetingKey
+
+        # A previous run sent CreateMeeting but never got the meetingKey back, so
+        # the meeting may exist - check before sending the request again
+        if meetingKey == PENDING:
+            meetingKey = FindMeeting( sessionSecurityContext, confName, startDate, duration,
+                deadline = latencyBudget.operationDeadline( 'LstsummaryMeeting' ) )
+
+            if meetingKey:
+                meetingIndex.put( key, meetingKey )
+                return meetingKey
+
+        # Recorded before sending, so an interrupted run can't leave the index
+        # with no trace of the request
+        else:
+            meetingIndex.put( key, PENDING )
+
+        meetingKey = createMeetingOnce( sessionSecurityContext, meetingPassword, confName, meetingType,
+            agenda, startDate, duration, deadline )
+
+        meetingIndex.put( key, meetingKey )
+
+        return meetingKey
+
+# Create a meeting, reconciling after an ambiguous failure rather than blindly
+# sending CreateMeeting again.  Returns the meetingKey
+def createMeetingOnce( sessionSecurityContext, meetingPassword, confName, meetingType,
+                       agenda, startDate, duration, deadline ):
+
+    try:
+        response = CreateMeeting( sessionSecurityContext,
+            meetingPassword = meetingPassword,
+            confName = confName,
+            meetingType = meetingType,
+            agenda = agenda,
+            startDate = startDate,
+            duration = duration,
+            deadline = deadline )
+
+    except ( SendRequestError, requests.exceptions.RequestException ) as err:
+
+        if not isAmbiguousFailure( err ):
+            raise
+
+        # The meeting may or may not exist - check with a single list query
+        # before trying again.  The check gets its own deadline, as the failed
+        # request may have used up the rest of the caller's
+        meetingKey = FindMeeting( sessionSecurityContext, confName, startDate, duration,
+            deadline = latencyBudget.operationDeadline( 'LstsummaryMeeting' ) )
+
+        if meetingKey:
+            return meetingKey
+
+        # Confirmed not created, so it is safe to send the request again
+        response = CreateMeeting( sessionSecurityContext,
+            meetingPassword = meetingPassword,
+            confName = confName,
+            meetingType = meetingType,
+            agenda = agenda,
+            startDate = startDate,
+            duration = duration,
+            deadline = deadline )
+
+    return response.find( '{*}body/{*}bodyContent/{*}meetingkey' ).text
+
+# Create many meetings in parallel, without duplicates if the run is retried
+#   meetings : list of dicts of CreateMeetingIdempotent keyword arguments
+#       (meetingPassword, confName, meetingType, agenda, startDate, duration)
+# Returns the list of meetingKeys, in the same order
+def CreateMeetings( sessionSecurityContext, meetingIndex, meetings, threads = 8, deadline = None ):
+
+    with concurrent.futures.ThreadPoolExecutor( threads ) as executor:
+
+        futures = [ executor.submit( CreateMeetingIdempotent, sessionSecurityContext, meetingIndex,
+                        deadline = deadline, **meeting )
+                    for meeting in meetings ]
+
+        return [ future.result() for future in futures ]
+
+# Look for an existing meeting hosted by the session user matching the spec
+#   Lists one page of the user's meetings starting from startDate, in start time order,
+#   so any match will be at the top of the list
+# Returns the meetingKey, or None if not found
+def FindMeeting( sessionSecurityContext, confName, startDate, duration, maximumNum = 50, deadline = None ):
+
+    try:
+        response = LstsummaryMeeting( sessionSecurityContext,
+            maximumNum = maximumNum,
+            orderBy = 'STARTTIME',
+            orderAD = 'ASC',
+            hostWebExId = sessionSecurityContext[ 'webExId' ],
+            startDateStart = startDate,
+            deadline = deadline )
+
+    except SendRequestError as err:
+
+        # Webex returns an error rather than an empty list when nothing matches
+        if 'no record found' in str( err.reason ).lower():
+            return None
+
+        raise
+
+    for meeting in response.iter( '{*}meeting' ):
+
+        if ( meeting.find( '{*}confName' ).text == confName and
+             meeting.find( '{*}startDate' ).text == startDate and
+             meeting.find( '{*}duration' ).text == str( duration ) ):
+
+            return meeting.find( '{*}meetingKey' ).text
+
+    return None
+
 def LstsummaryMeeting( sessionSecurityContext,
     maximumNum,
     orderBy,
     orderAD,
     hostWebExId,
-    startDateStart ):
+    startDateStart,
+    startFrom = 1,
+    raw = False,
+    deadline = None ):
 
     request = f'''<?xml version="1.0" encoding="UTF-8"?>
         <serv:message xmlns:serv="http://www.webex.com/schemas/2002/06/service"
@@ -243,6 +454,7 @@ def LstsummaryMeeting( sessionSecurityContext,
             <body>
                 <bodyContent xsi:type="java:com.webex.service.binding.meeting.LstsummaryMeeting">
                     <listControl>
+                        <startFrom>{startFrom}</startFrom>
                         <maximumNum>{maximumNum}</maximumNum>
                         <listMethod>AND</listMethod>
                     </listControl>
@@ -259,11 +471,15 @@ def LstsummaryMeeting( sessionSecurityContext,
             </body>
         </serv:message>'''
 
-    response = sendRequest( request )
+    # If raw is requested, return the response bytes for decoding elsewhere
+    if raw:
+        return sendRequestRaw( request, 'LstsummaryMeeting', deadline )
+
+    response = sendRequest( request, 'LstsummaryMeeting', deadline )
 
     return response
 
-def GetMeeting( sessionSecurityContext, meetingKey ):
+def GetMeeting( sessionSecurityContext, meetingKey, deadline = None ):
 
     request = f'''<?xml version="1.0" encoding="ISO-8859-1"?>
         <serv:message
@@ -283,11 +499,12 @@ def GetMeeting( sessionSecurityContext, meetingKey ):
             </body>
         </serv:message>'''
 
-    response = sendRequest( request )
+    response = sendRequest( request, 'GetMeeting', deadline )
 
     return response
 
-def DelMeeting( sessionSecurityContext, meetingKey ):
+#   meetingIndex : (optional) MeetingIndex to remove the deleted meeting from
+def DelMeeting( sessionSecurityContext, meetingKey, deadline = None, meetingIndex = None ):
 
     request = f'''<?xml version="1.0" encoding="ISO-8859-1"?>
         <serv:message
@@ -307,10 +524,272 @@ def DelMeeting( sessionSecurityContext, meetingKey ):
             </body>
         </serv:message>'''
 
-    response = sendRequest( request )
+    response = sendRequest( request, 'DelMeeting', deadline )
+
+    # So a later CreateMeetingIdempotent with the same spec creates it again
+    if meetingIndex is not None:
+        meetingIndex.discard( meetingKey )
+
+    return response
+
+def LstMeetingAttendee( sessionSecurityContext, meetingKey, maximumNum = 500, startFrom = 1, raw = False, deadline = None ):
+
+    request = f'''<?xml version="1.0" encoding="UTF-8"?>
+        <serv:message xmlns:serv="http://www.webex.com/schemas/2002/06/service"
+            xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+            <header>
+                <securityContext>
+                    <siteName>{sessionSecurityContext["siteName"]}</siteName>
+                    <webExID>{sessionSecurityContext["webExId"]}</webExID>
+                    <sessionTicket>{sessionSecurityContext["sessionTicket"]}</sessionTicket>  
+                </securityContext>
+            </header>
+            <body>
+                <bodyContent
+                    xsi:type="java:com.webex.service.binding.attendee.LstMeetingAttendee">
+                    <listControl>
+                        <startFrom>{startFrom}</startFrom>
+                        <maximumNum>{maximumNum}</maximumNum>
+                    </listControl>
+                    <meetingKey>{meetingKey}</meetingKey>
+                </bodyContent>
+            </body>
+        </serv:message>'''
+
+    # If raw is requested, return the response bytes for decoding elsewhere
+    if raw:
+        return sendRequestRaw( request, 'LstMeetingAttendee', deadline )
+
+    response = sendRequest( request, 'LstMeetingAttendee', deadline )
+
+    return response
+
+# Fetch every page of a list request, decoding each with a decodePool.py decoder
+#   fetchPage : function taking the startFrom record number, returning the raw response
+#   pool : (optional) a DecodePool, to parse the responses in worker processes
+# Returns the list of record tuples from all pages
+def listAllPages( fetchPage, decoder, pool = None ):
+
+    records = [ ]
+
+    while True:
+
+        content = fetchPage( len( records ) + 1 )
+
+        try:
+            total, page = decodeResponse( content, decoder, pool )
+
+        # Webex returns an error rather than an empty list when nothing matches
+        except SendRequestError as err:
+            if 'no record found' in str( err.reason ).lower():
+                break
+            raise
+
+        records.extend( page )
+
+        if not page or len( records ) >= total:
+            break
+
+    return records
+
+# Fetch all upcoming meetings for a host, a page at a time
+#   pool : (optional) a DecodePool, to parse the responses in worker processes
+# Returns a list of tuples, with fields as per decodePool.MEETING_FIELDS
+def ListHostMeetings( sessionSecurityContext, hostWebExId, startDateStart, pageSize = 500, pool = None, deadline = None ):
+
+    # All pages must be fetched within the ListHostMeetings budget
+    deadline = latencyBudget.operationDeadline( 'ListHostMeetings', deadline )
+
+    def fetchPage( startFrom ):
+        return LstsummaryMeeting( sessionSecurityContext,
+            maximumNum = pageSize,
+            orderBy = 'STARTTIME',
+            orderAD = 'ASC',
+            hostWebExId = hostWebExId,
+            startDateStart = startDateStart,
+            startFrom = startFrom,
+            raw = True,
+            deadline = deadline )
+
+    return listAllPages( fetchPage, decodePool.decodeMeetings, pool )
+
+# Fetch all attendees of a meeting, a page at a time
+#   pool : (optional) a DecodePool, to parse the responses in worker processes
+# Returns a list of tuples, with fields as per decodePool.ATTENDEE_FIELDS
+def ListMeetingAttendees( sessionSecurityContext, meetingKey, pageSize = 500, pool = None, deadline = None ):
+
+    # All pages must be fetched within the ListMeetingAttendees budget
+    deadline = latencyBudget.operationDeadline( 'ListMeetingAttendees', deadline )
+
+    def fetchPage( startFrom ):
+        return LstMeetingAttendee( sessionSecurityContext, meetingKey,
+            maximumNum = pageSize,
+            startFrom = startFrom,
+            raw = True,
+            deadline = deadline )
+
+    return listAllPages( fetchPage, decodePool.decodeAttendees, pool )
+
+# Export upcoming meetings for many hosts, using threads for the API requests
+#   pool : (optional) a DecodePool, so response parsing doesn't contend for the GIL
+# Returns a dict of hostWebExId -> list of meeting tuples
+def ExportMeetings( sessionSecurityContext, hostWebExIds, startDateStart, pageSize = 500, pool = None, threads = 8,
+                    deadline = None ):
+
+    with concurrent.futures.ThreadPoolExecutor( threads ) as executor:
+
+        futures = { hostWebExId: executor.submit( ListHostMeetings, sessionSecurityContext,
+                        hostWebExId, startDateStart, pageSize, pool, deadline )
+                    for hostWebExId in hostWebExIds }
+
+        return { hostWebExId: future.result() for hostWebExId, future in futures.items() }
+
+# Export the attendees of many meetings, using threads for the API requests
+#   pool : (optional) a DecodePool, so response parsing doesn't contend for the GIL
+# Returns a dict of meetingKey -> list of attendee tuples
+def ExportAttendees( sessionSecurityContext, meetingKeys, pageSize = 500, pool = None, threads = 8, deadline = None ):
+
+    with concurrent.futures.ThreadPoolExecutor( threads ) as executor:
+
+        futures = { meetingKey: executor.submit( ListMeetingAttendees, sessionSecurityContext,
+                        meetingKey, pageSize, pool, deadline )
+                    for meetingKey in meetingKeys }
+
+        return { meetingKey: future.result() for meetingKey, future in futures.items() }
+
+def GetSite( sessionSecurityContext, deadline = None ):
+
+    request = f'''<?xml version="1.0" encoding="UTF-8"?>
+        <serv:message xmlns:serv="http://www.webex.com/schemas/2002/06/service"
+            xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+            <header>
+                <securityContext>
+                    <siteName>{sessionSecurityContext["siteName"]}</siteName>
+                    <webExID>{sessionSecurityContext["webExId"]}</webExID>
+                    <sessionTicket>{sessionSecurityContext["sessionTicket"]}</sessionTicket>  
+                </securityContext>
+            </header>
+            <body>
+                <bodyContent xsi:type="java:com.webex.service.binding.site.GetSite" />
+            </body>
+        </serv:message>'''
+
+    response = sendRequest( request, 'GetSite', deadline )
 
     return response
 
+def LstMeetingType( sessionSecurityContext, maximumNum = 500, startFrom = 1, raw = False, deadline = None ):
+
+    request = f'''<?xml version="1.0" encoding="UTF-8"?>
+        <serv:message xmlns:serv="http://www.webex.com/schemas/2002/06/service"
+            xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+            <header>
+                <securityContext>
+                    <siteName>{sessionSecurityContext["siteName"]}</siteName>
+                    <webExID>{sessionSecurityContext["webExId"]}</webExID>
+                    <sessionTicket>{sessionSecurityContext["sessionTicket"]}</sessionTicket>  
+                </securityContext>
+            </header>
+            <body>
+                <bodyContent
+                    xsi:type="java:com.webex.service.binding.meetingtype.LstMeetingType">
+                    <listControl>
+                        <startFrom>{startFrom}</startFrom>
+                        <maximumNum>{maximumNum}</maximumNum>
+                    </listControl>
+                </bodyContent>
+            </body>
+        </serv:message>'''
+
+    # If raw is requested, return the response bytes for decoding elsewhere
+    if raw:
+        return sendRequestRaw( request, 'LstMeetingType', deadline )
+
+    response = sendRequest( request, 'LstMeetingType', deadline )
+
+    return response
+
+# Return the IDs of the meeting types available to the user, in GetUser order
+def userMeetingTypeIds( sessionSecurityContext, deadline = None ):
+
+    response = GetUser( sessionSecurityContext, deadline = deadline )
+
+    return [ int( meetingType.text )
+        for meetingType in response.find( '{*}body/{*}bodyContent/{*}meetingTypes' ) ]
+
+# Return ( etag, userMeetingTypeIds ) for the site/user's catalogue, where the
+# etag is a digest of the GetSite response and the user's meeting types - so a
+# change to either (e.g. a meeting type granted to the user) gives a new etag
+def catalogueEtag( sessionSecurityContext, deadline = None ):
+
+    response = GetSite( sessionSecurityContext, deadline = deadline )
+
+    bodyContent = etree.tostring( response.find( '{*}body/{*}bodyContent' ), method = 'c14n' )
+
+    typeIds = userMeetingTypeIds( sessionSecurityContext, deadline = deadline )
+
+    digest = hashlib.sha256( bodyContent )
+    digest.update( ','.join( str( typeId ) for typeId in typeIds ).encode() )
+
+    return digest.hexdigest(), typeIds
+
+# Fetch the site's meeting types (all pages), and build the catalogue with the
+# user's available meeting types (from userMeetingTypeIds())
+def FetchSiteCatalogue( sessionSecurityContext, etag, userMeetingTypeIds, deadline = None ):
+
+    meetingTypes = [ ]
+
+    while True:
+
+        content = LstMeetingType( sessionSecurityContext, startFrom = len( meetingTypes ) + 1,
+            raw = True, deadline = deadline )
+
+        total, records = decodeResponse( content, decodePool.decodeMeetingTypes )
+
+        meetingTypes.extend( siteCatalogue.MeetingType( int( typeId ), name, displayName, productCodePrefix, active )
+            for typeId, name, displayName, productCodePrefix, active in records )
+
+        if not records or len( meetingTypes ) >= total:
+            break
+
+    return siteCatalogue.SiteCatalogue( meetingTypes, userMeetingTypeIds, etag, time.time() )
+
+# Return the SiteCatalogue for the session's site/user
+#   The catalogue is loaded once per process, from the local cache when fresh - in
+#   which case no API requests are made.  When the cache is stale, GetSite and
+#   GetUser requests check whether the site or the user's meeting types have
+#   changed before the catalogue is re-fetched
+#   cache : (optional) a siteCatalogue.CatalogueCache object
+def LoadSiteCatalogue( sessionSecurityContext, cache = None, deadline = None ):
+
+    siteName = sessionSecurityContext[ 'siteName' ]
+    webExId = sessionSecurityContext[ 'webExId' ]
+
+    with catalogueLock:
+
+        catalogue = loadedCatalogues.get( ( siteName, webExId ) )
+
+        if catalogue:
+            return catalogue
+
+        cache = cache or siteCatalogue.CatalogueCache()
+        catalogue = cache.load( siteName, webExId )
+
+        if catalogue is None or not catalogue.isFresh():
+
+            etag, typeIds = catalogueEtag( sessionSecurityContext, deadline = deadline )
+
+            if catalogue is not None and catalogue.etag == etag:
+                catalogue = catalogue.revalidated()
+            else:
+                catalogue = FetchSiteCatalogue( sessionSecurityContext, etag, typeIds, deadline = deadline )
+
+            cache.save( siteName, webExId, catalogue )
+
+        loadedCatalogues[ ( siteName, webExId ) ] = catalogue
+
+        return catalogue
+
 if __name__ == "__main__":
 
     # AuthenticateUser and get sesssionTicket
@@ -335,17 +814,18 @@ if __name__ == "__main__":
     # Wait for the uesr to press Enter
     input( 'Press Enter to continue...' )
 
-    # GetSite - this will allow us to determine which meeting types are
-    # supported by the user's site.  Then we'll parse/save the first type.
+    # Load the site catalogue - this will allow us to determine which meeting types
+    # are available to the user (via GetSite/LstMeetingType/GetUser, unless already
+    # cached from a previous run).  Then we'll use the first type.
 
     try:
-        response = GetUser( sessionSecurityContext )
+        catalogue = LoadSiteCatalogue( sessionSecurityContext )
 
     except SendRequestError as err:
         print(err)
         raise SystemExit
 
-    meetingType = response.find( '{*}body/{*}bodyContent/{*}meetingTypes')[ 0 ].text
+    meetingType = catalogue.userMeetingTypes[ 0 ].id
     
     print( )
     print( f'First meetingType available: {meetingType}' )
@@ -362,8 +842,12 @@ if __name__ == "__main__":
     # Create a string variable with the timestamp in the specific format required by the API
     strDate =  timestamp.strftime( '%m/%d/%Y %H:%M:%S' )
 
+    # The local meeting index means re-running after a timeout won't create a duplicate
+    meetingIndex = MeetingIndex()
+
     try:
-        response = CreateMeeting( sessionSecurityContext,
+        meetingKey = CreateMeetingIdempotent( sessionSecurityContext,
+            meetingIndex,
             meetingPassword = 'C!sco123',
             confName = 'Test Meeting',
             meetingType = meetingType,
@@ -376,7 +860,7 @@ if __name__ == "__main__":
 
     print( )
     print( 'Meeting Created:', '\n')
-    print( '    Meeting Key:', response.find( '{*}body/{*}bodyContent/{*}meetingkey').text )
+    print( '    Meeting Key:', meetingKey )
     print( )
 
     input( 'Press Enter to continue...' )
@@ -429,7 +913,7 @@ if __name__ == "__main__":
     input( 'Press Enter to continue...' )
 
     try:
-        response = DelMeeting( sessionSecurityContext, nextMeetingKey )
+        response = DelMeeting( sessionSecurityContext, nextMeetingKey, meetingIndex = meetingIndex )
     except SendRequestError as err:
         print(err)
         raise SystemError    
@@ -0,0 +1,169 @@
+# Compact, read-only catalogue of a Webex site's meeting types, persisted between runs
+
+# The catalogue combines the site's meeting types (LstMeetingType) with the
+# meeting types available to the user (GetUser), indexed for lookup by meeting
+# type ID and by name.  It is saved to a local JSON file along with a version
+# tag (a digest of the GetSite response and the user's meeting types), so later
+# runs can skip the API calls entirely while the cache is fresh, and only re-fetch
+# the catalogue when the site's configuration or the user's meeting types have
+# actually changed.
+
+# See LoadSiteCatalogue() in sampleFlow.py for fetching/revalidating the catalogue.
+
+# Configure via .env:
+
+#   CATALOGUE_FILE : cache file name (default: .siteCatalogue.json)
+#   CATALOGUE_MAX_AGE : seconds before a cached catalogue is revalidated (default: 86400)
+
+# Copyright (c) 2019 Cisco and/or its affiliates.
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import collections
+import json
+import os
+import threading
+import time
+import types
+
+# Bump when the cache file layout changes, so old caches are ignored
+FORMAT_VERSION = 2
+
+DEFAULT_CATALOGUE_FILE = '.siteCatalogue.json'
+
+MeetingType = collections.namedtuple( 'MeetingType', [ 'id', 'name', 'displayName', 'productCodePrefix', 'active' ] )
+
+class SiteCatalogue:
+
+    __slots__ = ( 'meetingTypes', 'userMeetingTypes', 'etag', 'fetchedAt', 'byId', 'byName' )
+
+    #   meetingTypes : list of MeetingType, as returned by LstMeetingType
+    #   userMeetingTypeIds : IDs of the meeting types available to the user, in GetUser order
+    #   etag : version tag of the site configuration and user meeting types the
+    #       catalogue was built from
+    #   fetchedAt : time.time() the catalogue was fetched or last revalidated
+    def __init__( self, meetingTypes, userMeetingTypeIds, etag, fetchedAt ):
+
+        # Attributes are set via object.__setattr__, as the catalogue is read-only -
+        # it's shared between threads via sampleFlow.loadedCatalogues
+        object.__setattr__( self, 'meetingTypes', tuple( meetingTypes ) )
+        object.__setattr__( self, 'etag', etag )
+        object.__setattr__( self, 'fetchedAt', fetchedAt )
+
+        # Read-only indexes - names are matched case-insensitively, on either
+        # the meeting type's name or its display name
+        object.__setattr__( self, 'byId',
+            types.MappingProxyType( { meetingType.id: meetingType for meetingType in self.meetingTypes } ) )
+
+        byName = { }
+        for meetingType in self.meetingTypes:
+            for name in ( meetingType.displayName, meetingType.name ):
+                if name:
+                    byName.setdefault( name.lower(), meetingType )
+        object.__setattr__( self, 'byName', types.MappingProxyType( byName ) )
+
+        # A user meeting type missing from the site list still gets an entry
+        object.__setattr__( self, 'userMeetingTypes',
+            tuple( self.byId.get( typeId ) or MeetingType( typeId, None, None, None, None )
+                   for typeId in userMeetingTypeIds ) )
+
+    def __setattr__( self, name, value ):
+
+        raise AttributeError( 'SiteCatalogue is read-only' )
+
+    def __delattr__( self, name ):
+
+        raise AttributeError( 'SiteCatalogue is read-only' )
+
+    # Return the MeetingType for an ID (int or str), or None
+    def meetingType( self, typeId ):
+
+        return self.byId.get( int( typeId ) )
+
+    # Return the MeetingType with the given name or display name, or None
+    def meetingTypeNamed( self, name ):
+
+        return self.byName.get( name.lower() )
+
+    def isFresh( self, maxAge = None ):
+
+        if maxAge is None:
+            maxAge = float( os.getenv( 'CATALOGUE_MAX_AGE' ) or 86400 )
+
+        return time.time() - self.fetchedAt < maxAge
+
+    # Return a copy of the catalogue marked as revalidated now
+    def revalidated( self ):
+
+        return SiteCatalogue( self.meetingTypes, [ meetingType.id for meetingType in self.userMeetingTypes ],
+            self.etag, time.time() )
+
+    def toJson( self ):
+
+        return {
+            'formatVersion': FORMAT_VERSION,
+            'etag': self.etag,
+            'fetchedAt': self.fetchedAt,
+            'meetingTypes': [ list( meetingType ) for meetingType in self.meetingTypes ],
+            'userMeetingTypeIds': [ meetingType.id for meetingType in self.userMeetingTypes ]
+        }
+
+    @staticmethod
+    def fromJson( data ):
+
+        return SiteCatalogue( [ MeetingType( *fields ) for fields in data[ 'meetingTypes' ] ],
+            data[ 'userMeetingTypeIds' ], data[ 'etag' ], data[ 'fetchedAt' ] )
+
+# Cache file holding one catalogue per site/user
+class CatalogueCache:
+
+    # fileName : (optional) path of the JSON cache file
+    def __init__( self, fileName = None ):
+
+        self.fileName = fileName or os.getenv( 'CATALOGUE_FILE' ) or DEFAULT_CATALOGUE_FILE
+        self.lock = threading.Lock()
+
+    def readEntries( self ):
+
+        try:
+            with open( self.fileName, 'r', encoding = 'utf-8' ) as cacheFile:
+                return json.load( cacheFile )
+        except ( FileNotFoundError, ValueError ):
+            return { }
+
+    # Return the cached SiteCatalogue (fresh or not), or None
+    def load( self, siteName, webExId ):
+
+        data = self.readEntries().get( f'{siteName}/{webExId.lower()}' )
+
+        if not data or data.get( 'formatVersion' ) != FORMAT_VERSION:
+            return None
+
+        return SiteCatalogue.fromJson( data )
+
+    def save( self, siteName, webExId, catalogue ):
+
+        with self.lock:
+            entries = self.readEntries()
+            entries[ f'{siteName}/{webExId.lower()}' ] = catalogue.toJson()
+
+            # Write to a temporary file then rename it over the cache
+            tempName = self.fileName + '.tmp'
+
+            with open( tempName, 'w', encoding = 'utf-8' ) as cacheFile:
+                json.dump( entries, cacheFile, separators = ( ',', ':' ) )
+
+            os.replace( tempName, self.fileName )